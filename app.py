@@ -1,8 +1,10 @@
 import pandas as pd
 from dash import Dash, dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Output, Input
+from dash.dependencies import Output, Input, State
+from dash.exceptions import PreventUpdate
 from dash_bootstrap_templates import load_figure_template
+from flask_caching import Cache
 import logging
 
 logging.basicConfig(
@@ -19,6 +21,7 @@ logger.debug('Application started')
 
 from config import (
     services,
+    granularities,
 )
 
 from visual_functions import (
@@ -46,27 +49,31 @@ from support_functions import (
     create_metrics,
     create_kpis,
 )
-import json
-#from io import StringIO # This is to solve the problem of future pandas versions removing the ability to directly pass a JSON string to read_json
-
-mta_data = pd.read_csv('./data/MTA_Daily_Ridership.csv',parse_dates=['Date'])
-mta_data = mta_data.rename(columns={
-            'Subways: Total Estimated Ridership' : 'Subways',
-            'Subways: % of Comparable Pre-Pandemic Day' : 'Subways: % of Pre-Pandemic',
-            'Buses: Total Estimated Ridership' : 'Buses',
-            'Buses: % of Comparable Pre-Pandemic Day' : 'Buses: % of Pre-Pandemic',
-            'LIRR: Total Estimated Ridership' : 'LIRR',
-            'LIRR: % of Comparable Pre-Pandemic Day' : 'LIRR: % of Pre-Pandemic',
-            'Metro-North: Total Estimated Ridership' : 'Metro-North',
-            'Metro-North: % of Comparable Pre-Pandemic Day' : 'Metro-North: % of Pre-Pandemic',
-            'Access-A-Ride: Total Scheduled Trips' : 'Access-A-Ride',
-            'Access-A-Ride: % of Comparable Pre-Pandemic Day' : 'Access-A-Ride: % of Pre-Pandemic',
-            'Bridges and Tunnels: Total Traffic' : 'Bridges and Tunnels',
-            'Bridges and Tunnels: % of Comparable Pre-Pandemic Day' : 'Bridges and Tunnels: % of Pre-Pandemic',
-            'Staten Island Railway: Total Estimated Ridership' : 'Staten Island Railway',
-            'Staten Island Railway: % of Comparable Pre-Pandemic Day' : 'Staten Island Railway: % of Pre-Pandemic'
-            },
-            )
+
+# The names replace the long column headings in the file, in the order they appear there
+column_names = [
+    'Date',
+    'Subways', 'Subways: % of Pre-Pandemic',
+    'Buses', 'Buses: % of Pre-Pandemic',
+    'LIRR', 'LIRR: % of Pre-Pandemic',
+    'Metro-North', 'Metro-North: % of Pre-Pandemic',
+    'Access-A-Ride', 'Access-A-Ride: % of Pre-Pandemic',
+    'Bridges and Tunnels', 'Bridges and Tunnels: % of Pre-Pandemic',
+    'Staten Island Railway', 'Staten Island Railway: % of Pre-Pandemic'
+]
+
+# Give pandas the column types and date format up front so it does not have to infer them
+mta_data = pd.read_csv(
+    './data/MTA_Daily_Ridership.csv',
+    header=0,
+    names=column_names,
+    parse_dates=['Date'],
+    date_format='%Y-%m-%d',
+    dtype={
+        column: 'int16' if ': % of Pre-Pandemic' in column else 'int64'
+        for column in column_names[1:]
+    }
+)
 
 dbc_css = 'https://cdn.jsdelivr.net/gh/AnnMarieW/dash-bootstrap-templates/dbc.min.css'
 
@@ -75,8 +82,100 @@ app = Dash(
     suppress_callback_exceptions=True
 )
 load_figure_template('COSMO')
-# comparison_table = create_comparison_table(mta_data)
+
+# mta_data never changes for the life of the process so cached results never need to expire
+cache = Cache(app.server, config={
+    'CACHE_TYPE': 'SimpleCache',
+    'CACHE_DEFAULT_TIMEOUT': 0
+})
+
+
+# Resample once per granularity at start up rather than on every callback
+mta_thousands = create_thousand_dataframe(mta_data).set_index('Date')
+granular_data_frames = {
+    granularity: resample_data(mta_thousands, granularity)
+    for granularity in granularities
+}
+
+
+def get_granular_data(granularity: str) -> pd.DataFrame:
+    '''
+    Returns the precomputed dataframe for the selected granularity, the chart functions only read from it.
+    '''
+    return granular_data_frames[granularity]
+
+
+@cache.memoize()
+def get_metrics(granularity: str, selected_services: list) -> dict:
+    '''
+    Returns the ridership card metrics for the selected granularity and services.
+    '''
+    return create_metrics(get_granular_data(granularity), selected_services)
+
+
+@cache.memoize()
+def get_ridership_cards(granularity: str, selected_services: list) -> list:
+    '''
+    Returns the ridership cards for the selected granularity and services.
+    '''
+    return create_ridership_cards(get_granular_data(granularity), selected_services, granularity,
+                                  get_metrics(granularity, selected_services))
+
+
+# The chart helpers cache the figure as a dict, unpickling a go.Figure validates it again
+@cache.memoize()
+def get_service_line_chart(granularity: str, selected_services: list) -> dict:
+    '''
+    Returns the service line chart for the selected granularity and services.
+    '''
+    return create_service_line_chart(get_granular_data(granularity), granularity, selected_services).to_dict()
+
+
+@cache.memoize()
+def get_dual_axis_chart(granularity: str, selected_services: list) -> dict:
+    '''
+    Returns the dual axis chart for the selected granularity and services.
+    '''
+    return create_dual_axis_chart(get_granular_data(granularity), granularity, selected_services).to_dict()
+
+
+@cache.memoize()
+def get_ridership_scatterplot(selected_services: list) -> dict:
+    '''
+    Returns the ridership scatterplot for the selected services.
+    '''
+    return create_ridership_scatterplot(mta_data, selected_services).to_dict()
+
+
+# The KPIs and these visuals only depend on the complete dataset so they are built once,
+# the figures are kept as dicts so they are not converted from go.Figure on every page load
 kpis = create_kpis(mta_data)
+kpi_cards = create_kpi_cards(kpis)
+recovery_bar_chart = create_recovery_bar_chart(mta_data).to_dict()
+ridership_pie_chart = create_ridership_pie_chart(mta_data).to_dict()
+before_after_chart = create_before_after_chart(mta_data, services).to_dict()
+daily_variability_boxplot = create_daily_variability_boxplot(
+    mta_data, services, mta_data['Date'].min(), mta_data['Date'].max()).to_dict()
+comparison_table = create_comparison_table(mta_data)
+# The heatmaps only depend on the granularity so they are built once for each option
+correlation_matrices = {
+    granularity: create_correlation_matrix(get_granular_data(granularity), granularity).to_dict()
+    for granularity in granularities
+}
+recovery_heatmaps = {
+    granularity: create_recovery_heatmap(get_granular_data(granularity), granularity).to_dict()
+    for granularity in granularities
+}
+
+
+def get_correlation(granularity: str, first_service: str, second_service: str) -> float:
+    '''
+    Returns the correlation between two services as shown in the correlation heatmap, so the notes always match the chart.
+    '''
+    heatmap = correlation_matrices[granularity]['data'][0]
+    return heatmap['z'][list(heatmap['y']).index(first_service)][list(heatmap['x']).index(second_service)]
+
+
 app.layout = dbc.Container(
     [
         html.Link(
@@ -86,20 +185,7 @@ app.layout = dbc.Container(
         ),
         # Store data for later use
         dcc.Store(id='selected_services_store'),
-        dcc.Store(id='granular_data_json_store'),
-        dcc.Store(id='mta_data_json_store'),
         dcc.Store(id='granularity_store'),
-        dcc.Store(id='metrics_store', data=json.dumps({"placeholder": "no_data"})),
-        dcc.Store(id='kpi_store', data=json.dumps({
-            "total_ridership": "N/A",
-            "highest_ridership_day": "N/A",
-            "total_recovery": "N/A",
-            "top_service": "N/A",
-            "recovery_percentage": 0,
-            "yoy_growth": 0,
-            "avg_lockdown_ridership": "N/A",
-            "avg_post_lockdown_ridership": "N/A"
-        })),
 
         # Title row
         dbc.Row(
@@ -126,17 +212,19 @@ app.layout = dbc.Container(
         dcc.Tabs(
             className='dbc',
             id='tabs',
+            value='Overview_and_key_metrics',
             children=[
                 # Overview & Key Metrics Tab
                 dcc.Tab(
                     id='Overview_and_key_metrics',
+                    value='Overview_and_key_metrics',
                     label='Overview & Key Metrics',
                     className='dbc',
                     children=[
                         # dbc.Row(),
                         dbc.Row(
                             id='kpi_card_row',
-                            children=create_kpi_cards(kpis),
+                            children=kpi_cards,
                             style={
                                 'display': 'flex',
                                 'justify-content': 'flex-start',
@@ -183,6 +271,7 @@ app.layout = dbc.Container(
                 # Service Recovery Analysis Tab
                 dcc.Tab(
                     id='service_recovery_analysis',
+                    value='service_recovery_analysis',
                     label='Service Recovery Analysis',
                     className='dbc',
                     children=[
@@ -216,6 +305,7 @@ app.layout = dbc.Container(
                                     ),
                                         dcc.Graph(
                                             id='recovery_bar_chart',
+                                            figure=recovery_bar_chart,
                                             style={
                                                 'backgroundColor': 'transparent'},
                                             config={
@@ -238,7 +328,7 @@ app.layout = dbc.Container(
                                             }
                                         ),
                                         html.P(
-                                        'Note: Strong a correlation value of 0.97 between Metro-North and LIRR suggest a similar recovery pattern, '
+                                        f'Note: A strong correlation value of {get_correlation("Month", "Metro-North", "LIRR"):.2f} between Metro-North and LIRR suggests a similar recovery pattern, '
                                         'reflecting the interdependence of these suburban transit lines post-pandemic.',
                                         style={
                                             'text-align': 'left',  # Center the annotation below the matrix
@@ -248,7 +338,7 @@ app.layout = dbc.Container(
                                         }
                                         ),
                                         html.P(
-                                        'There is strong correlation value of 0.89 between Access-A-Ride and LIRR which suggests that Access-A-Ride'
+                                        f'There is a strong correlation value of {get_correlation("Month", "Access-A-Ride", "LIRR"):.2f} between Access-A-Ride and LIRR which suggests that Access-A-Ride'
                                         ' may be used to deliver passengers to LIRR stations instead of passengers using the bus.',
                                         style={
                                             'text-align': 'left',  # Center the annotation below the matrix
@@ -288,6 +378,7 @@ app.layout = dbc.Container(
                 # Ridership Comparisons Tab
                 dcc.Tab(
                     id='ridership_comparisons',
+                    value='ridership_comparisons',
                     label='Ridership Comparisons',
                     className='dbc',
                     children=[
@@ -322,6 +413,7 @@ app.layout = dbc.Container(
                                     ),
                                     dcc.Graph(
                                         id='ridership_pie_chart',
+                                        figure=ridership_pie_chart,
                                         config={
                                             'displayModeBar': False  # Turn off the toolbar
                                         }
@@ -361,6 +453,7 @@ app.layout = dbc.Container(
                                     ),
                                     dcc.Graph(
                                         id='before_after_chart',
+                                        figure=before_after_chart,
                                         config={
                                             'displayModeBar': False  # Turn off the toolbar
                                         },
@@ -432,7 +525,7 @@ app.layout = dbc.Container(
                                         }
                                     ),
                                     html.Div(
-                                        dbc.Table(id='comparison_table'),
+                                        dbc.Table(comparison_table, id='comparison_table'),
                                         style={
                                             'width': '100%',
                                             'backgroundColor': 'transparent'
@@ -452,6 +545,7 @@ app.layout = dbc.Container(
                 # Detailed Service Trends Tab
                 dcc.Tab(
                     id='detailed_service_trends',
+                    value='detailed_service_trends',
                     label='Detailed Service Trends',
                     className='dbc',
                     children=[
@@ -486,6 +580,7 @@ app.layout = dbc.Container(
                             dbc.Col(
                                 dcc.Graph(
                                     id='daily_variability_boxplot',
+                                    figure=daily_variability_boxplot,
                                     config={
                                         'displayModeBar': False  # Turn off the toolbar
                                     }
@@ -500,6 +595,7 @@ app.layout = dbc.Container(
                 ),
                 dcc.Tab(
                     id='whats-next',
+                    value='whats-next',
                     label='What\'s Next?',
                     className='dbc',
                     children=[
@@ -528,109 +624,104 @@ app.layout = dbc.Container(
     Output('ridership_card_row', 'children'),
     [
         Input('selected_services_store', 'data'),
-        Input('granular_data_json_store', 'data'),
         Input('granularity_store', 'data'),
-        Input('metrics_store', 'data'),
-        Input('tabs', 'value')
     ],
     prevent_initial_call='initial_duplicate',
 )
 
-def update_ridership_cards(selected_services, granular_data_json, granularity, metrics_json, tab):
+def update_ridership_cards(selected_services, granularity):
+    # The stores are only updated while the overview tab is shown, so the cards follow them
+    if granularity is None:
+        raise PreventUpdate
     if not selected_services:
         selected_services = services
-    mta_thousands = create_thousand_dataframe(mta_data)  # Ensure this function handles empty data gracefully
-    if mta_thousands is None:
-        logger.error("mta_thousands is None after create_thousand_dataframe(). Exiting function.")
-        return []
-    mta_thousands.set_index('Date', inplace=True)
-    granular_data = resample_data(mta_thousands, granularity)  # Ensure this function handles granularity properly
-    if granular_data is None:
-        logger.error("granular_data is None after resample_data(). Exiting function.")
-        return []
-    metrics = create_metrics(granular_data, selected_services)
-    if metrics is None:
-        logger.error("metrics is None after create_metrics(). Exiting function.")
-        return []
     # Return ridership cards using the new data
-    return create_ridership_cards(granular_data, selected_services, granularity, metrics)
+    return get_ridership_cards(granularity, selected_services)
 
 
+def get_selected_services(service_dropdown_value) -> list:
+    '''
+    Returns the list of services chosen in the services dropdown, all services when none are chosen.
+    '''
+    return (
+        services
+        if service_dropdown_value == 'all_services' or not service_dropdown_value
+        else service_dropdown_value
+    )
+
+
+# Each tab has its own callback so only the visible tab is built, the rest are built when selected
 @app.callback(
     [
         Output('service_line_chart', 'figure'),
         Output('selected_services_store', 'data'),
-        Output('granular_data_json_store', 'data'),
         Output('granularity_store', 'data'),
-        Output('mta_data_json_store', 'data'),
-        Output('metrics_store', 'data'),
-        Output('kpi_store', 'data'),
-        Output('correlation_heatmap', 'figure'),
-        Output('dual_axis_chart', 'figure'),
-        Output('recovery_bar_chart', 'figure'),
-        Output('recovery_heatmap', 'figure'),
-        Output('ridership_pie_chart', 'figure'),
-        Output('ridership_scatterplot', 'figure'),
-        Output('before_after_chart', 'figure'),
-        Output('daily_variability_boxplot', 'figure'),
-        Output('comparison_table', 'children'),
     ],
     [
         Input('granularity_dropdown', 'value'),
         Input('services_dropdown', 'value'),
-        Input('selected_services_store', 'data'),
+        Input('tabs', 'value'),
+    ],
+    [
+        State('selected_services_store', 'data'),
+        State('granularity_store', 'data'),
     ],
     prevent_initial_call='initial_duplicate',
 )
-def display_information(granularity_dropdown_value, service_dropdown_value, selected_services):
-    selected_services = (
-        services
-        if service_dropdown_value == 'all_services' or not service_dropdown_value
-        else service_dropdown_value
-    )
-    mta_thousands = create_thousand_dataframe(mta_data)
-    mta_thousands.set_index('Date', inplace=True)
-    granular_data = resample_data(mta_thousands, granularity_dropdown_value)
-    granular_data_json = granular_data.to_json(orient='split')
-    mta_data_json = mta_data.to_json(orient='split')
-    service_line_chart = create_service_line_chart(
-        granular_data, granularity_dropdown_value, selected_services
-    )
-    kpis = create_kpis(mta_data)
-    kpis_json = json.dumps(kpis)
-    metrics = create_metrics(granular_data, selected_services)
-    metrics_json = json.dumps(metrics)
-    correlation_matrix = create_correlation_matrix(
-        granular_data, granularity_dropdown_value)
-    dual_axis_chart = create_dual_axis_chart(
-        granular_data, granularity_dropdown_value, selected_services)
-    start_date = mta_data['Date'].min()
-    end_date = mta_data['Date'].max()
-    recovery_bar_chart = create_recovery_bar_chart(mta_data)
-    recovery_heatmap = create_recovery_heatmap(
-        granular_data, granularity_dropdown_value)
-    ridership_pie_chart = create_ridership_pie_chart(mta_data)
-    ridership_scatterplot = create_ridership_scatterplot(
-        mta_data, selected_services)
-    before_after_chart = create_before_after_chart(mta_data, services)
-    daily_variability_boxplot = create_daily_variability_boxplot(
-        mta_data, services, start_date, end_date)
-    comparison_table = create_comparison_table(mta_data)
+def display_information(granularity_dropdown_value, service_dropdown_value, tab,
+                        stored_services, stored_granularity):
+    if tab != 'Overview_and_key_metrics':
+        raise PreventUpdate
+    selected_services = get_selected_services(service_dropdown_value)
+    # The stores hold what the tab was last built with, nothing to do if the dropdowns have not changed since
+    if selected_services == stored_services and granularity_dropdown_value == stored_granularity:
+        raise PreventUpdate
+    service_line_chart = get_service_line_chart(
+        granularity_dropdown_value, selected_services)
     return (
         service_line_chart,
         selected_services,
-        granular_data_json,
         granularity_dropdown_value,
-        mta_data_json,
-        metrics_json,
-        kpis_json,
-        correlation_matrix,
-        dual_axis_chart,
-        recovery_bar_chart,
-        recovery_heatmap,
-        ridership_pie_chart,
-        ridership_scatterplot,
-        before_after_chart,
-        daily_variability_boxplot,
-        comparison_table,
-    )
\ No newline at end of file
+    )
+
+
+@app.callback(
+    [
+        Output('correlation_heatmap', 'figure'),
+        Output('recovery_heatmap', 'figure'),
+    ],
+    [
+        Input('granularity_dropdown', 'value'),
+        Input('tabs', 'value'),
+    ],
+)
+def display_service_recovery_analysis(granularity_dropdown_value, tab):
+    # These charts do not depend on the selected services
+    if tab != 'service_recovery_analysis':
+        raise PreventUpdate
+    return (
+        correlation_matrices[granularity_dropdown_value],
+        recovery_heatmaps[granularity_dropdown_value],
+    )
+
+
+@app.callback(
+    [
+        Output('dual_axis_chart', 'figure'),
+        Output('ridership_scatterplot', 'figure'),
+    ],
+    [
+        Input('granularity_dropdown', 'value'),
+        Input('services_dropdown', 'value'),
+        Input('tabs', 'value'),
+    ],
+)
+def display_detailed_service_trends(granularity_dropdown_value, service_dropdown_value, tab):
+    if tab != 'detailed_service_trends':
+        raise PreventUpdate
+    selected_services = get_selected_services(service_dropdown_value)
+    dual_axis_chart = get_dual_axis_chart(
+        granularity_dropdown_value, selected_services)
+    # The scatterplot uses the daily data so it does not depend on the granularity
+    ridership_scatterplot = get_ridership_scatterplot(selected_services)
+    return dual_axis_chart, ridership_scatterplot
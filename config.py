@@ -1,10 +1,11 @@
 # Centralized configuration for shared data
-from matplotlib.colors import to_rgba
+import numpy as np
 
 
 def calculate_tinted_colour(hex_colour, alpha=0.5):
-    rgba = to_rgba(hex_colour, alpha)
-    return 'rgba({},{},{},{})'.format(int(rgba[0]*255), int(rgba[1]*255), int(rgba[2]*255), rgba[3])
+    # The colours are '#RRGGBB' literals, so the channels can be read straight from the hex pairs
+    red, green, blue = (int(hex_colour[i:i + 2], 16) for i in (1, 3, 5))
+    return 'rgba({},{},{},{})'.format(red, green, blue, alpha)
 
 
 services = ['Subways',
@@ -15,6 +16,22 @@ services = ['Subways',
             'Bridges and Tunnels',
             'Staten Island Railway']
 
+granularities = ['Month', 'Quarter', 'Year']
+
+# Period boundaries, compared directly against the datetime64 Date column
+pandemic_start = np.datetime64('2020-03-11')  # First day of lockdown
+lockdown_end = np.datetime64('2020-06-08')  # Last day of lockdown
+post_lockdown_start = np.datetime64('2020-06-09')  # First day of post-lockdown
+# Comparison windows, each end date is exclusive
+current_period_start = np.datetime64('2024-10-01')  # Current period: 1-10 October 2024
+current_period_end = np.datetime64('2024-10-11')
+first_post_pandemic_period_start = np.datetime64('2021-10-01')  # First post-pandemic year: 1-10 October 2021
+first_post_pandemic_period_end = np.datetime64('2021-10-11')
+previous_october_start = np.datetime64('2023-10-01')  # October 2023, for year-on-year growth
+previous_october_end = np.datetime64('2023-11-01')
+current_october_start = np.datetime64('2024-10-01')  # October 2024, for year-on-year growth
+current_october_end = np.datetime64('2024-11-01')
+
 full_colours = ['#012A4A', '#01497C', '#2A6F97', '#2C7DA0',
                 '#61A5C2', '#89C2D9', '#A9D6E5']  # Colours from a coolor.co palette
 # Build the service colours dictionary for all charts
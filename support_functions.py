@@ -1,77 +1,42 @@
 import pandas as pd
-#import matplotlib as plt  # For testing forecasting - to be removed
+import numpy as np
 #import plotly.express as px
 #import plotly.graph_objects as go
-#import socket  # For finding next free port
+import socket  # For finding next free port
 from config import (
     services,
+    pandemic_start,
+    lockdown_end,
+    post_lockdown_start,
+    current_period_start,
+    current_period_end,
+    first_post_pandemic_period_start,
+    first_post_pandemic_period_end,
+    previous_october_start,
+    previous_october_end,
+    current_october_start,
+    current_october_end,
 )
-from typing import Tuple
+from typing import Optional, Tuple
 
 import logging
 
 logging.basicConfig(filename='debug.log', level=logging.DEBUG,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-def calculate_baseline_ridership(mta_data: pd.DataFrame, ridership_cols: list, baseline_period: pd.Series) -> float:
+def calculate_total_recovery(baseline_totals: pd.Series, current_totals: pd.Series) -> float:
     """
-    Calculate the baseline ridership based on actual ridership columns.
+    Calculate total ridership recovery as a percentage of pre-pandemic levels (comparing October 2024 with the pre-pandemic baseline).
 
     Args:
-        mta_data (pd.DataFrame)    : DataFrame containing ridership data.
-        baseline_period (pd.Series): Series of dates
-
-    Returns:
-        float: The total baseline ridership.
-    """
-    # Convert Date to datetime if not already
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'], format='%m/%d/%Y')
-
-    # Calculate total baseline ridership
-    baseline_ridership = mta_data.loc[baseline_period,
-                                      ridership_cols].sum().sum()
-
-    return baseline_ridership
-
-
-def calculate_current_ridership(mta_data: pd.DataFrame, ridership_cols: list, current_period: pd.Series) -> float:
-    """
-    Calculate the current ridership for the same period (e.g., March 2023).
-
-    Args:
-        mta_data (pd.DataFrame): DataFrame containing ridership data.
-
-    Returns:
-        float: The total current ridership.
-    """
-
-    # Calculate total current ridership for March 2024
-    current_ridership = mta_data.loc[current_period,
-                                     ridership_cols].sum().sum()
-
-    return current_ridership
-
-
-def calculate_total_recovery(mta_data: pd.DataFrame, ridership_cols) -> float:
-    """
-    Calculate total ridership recovery as a percentage of pre-pandemic levels (comparing March 2023 with March 2020).
-
-    Args:
-        mta_data (pd.DataFrame): The DataFrame containing ridership data.
+        baseline_totals (pd.Series): Ridership for each service over the baseline period (dates before 11/03/2020).
+        current_totals (pd.Series) : Ridership for each service over the current period.
 
     Returns:
         float: The total recovery percentage.
     """
-    # Define baseline period: dates < 11/03/2020
-    baseline_period = (mta_data['Date'] < '2020-03-11')
-
-    current_period = (mta_data['Date'].dt.year == 2024) & (
-        mta_data['Date'].dt.month == 10) & (mta_data['Date'].dt.day < 11)
-
-    baseline_ridership = calculate_baseline_ridership(
-        mta_data, ridership_cols, baseline_period)
-    current_ridership = calculate_current_ridership(
-        mta_data, ridership_cols, current_period)
+    baseline_ridership = baseline_totals.sum()
+    current_ridership = current_totals.sum()
 
     # Calculate total recovery percentage
     total_recovery = (current_ridership / baseline_ridership) * \
@@ -80,46 +45,27 @@ def calculate_total_recovery(mta_data: pd.DataFrame, ridership_cols) -> float:
     return total_recovery
 
 
-def calculate_top_service_recovery(mta_data: pd.DataFrame, baseline_period: pd.Series, current_period: pd.Series) -> Tuple[str, float]:
+def calculate_top_service_recovery(baseline_totals: pd.Series, current_totals: pd.Series) -> Tuple[str, float]:
     """
     Calculate the top-performing service based on recovery percentage.
 
     Args:
-        mta_data (pd.DataFrame)    : DataFrame containing ridership data with service columns.
-        baseline_period (pd.Series): baseline period
-        current_period (pd.Series) : current_perid
+        baseline_totals (pd.Series): Ridership for each service over the baseline period.
+        current_totals (pd.Series) : Ridership for each service over the current period.
 
     Returns:
         Tuple[str, float]  The top-performing service based on recovery percentage and the top-performing service recovery percentage
     """
-    # Convert 'Date' to datetime format
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'], format='%m/%d/%Y')
+    baseline_ridership = baseline_totals.to_numpy()
 
-    # Select relevant columns: ridership data and pre-pandemic percentage columns
-    services = [col.split(':')[0]
-                for col in mta_data.columns if ': % of Pre-Pandemic' in col]
-
-    # Calculate recovery for each service
-    recovery_percentages = {}
-
-    for service in services:
-        # Get ridership for the current period and baseline period
-        baseline_ridership = mta_data.loc[baseline_period, service].sum()
-        current_ridership = mta_data.loc[current_period, service].sum()
-
-        # Calculate recovery percentage for the service
-        if baseline_ridership > 0:
-            recovery_percentage = (current_ridership /
-                                   baseline_ridership) * 100
-        else:
-            recovery_percentage = 0
-
-        recovery_percentages[service] = recovery_percentage
+    # Calculate recovery percentage for each service, services without a baseline count as 0
+    recovery_percentages = np.divide(current_totals.to_numpy(), baseline_ridership,
+                                     out=np.zeros(len(baseline_ridership)), where=baseline_ridership > 0) * 100
 
     # Identify the top-performing service based on the highest recovery percentage
-    top_service = max(recovery_percentages, key=recovery_percentages.get)
+    top_service_position = recovery_percentages.argmax()
 
-    return top_service, recovery_percentages[top_service]
+    return baseline_totals.index[top_service_position], recovery_percentages[top_service_position]
 
 
 def create_thousand_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -133,19 +79,14 @@ def create_thousand_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame: The dataframe with the adjusted figures
     """
 
-    df_thousands = df.copy()
-    columns_to_divide = [
-        'Subways',
-        'Buses',
-        'LIRR',
-        'Metro-North',
-        'Access-A-Ride',
-        'Bridges and Tunnels',
-        'Staten Island Railway'
-    ]
-    # Perform the division and update only those columns
-    df_thousands[columns_to_divide] = round(
-        df[columns_to_divide] / 1_000, 0)  # Removed dividing by 1_000
+    # Shallow copy, the untouched columns are shared and the ridership columns are replaced below
+    df_thousands = df.copy(deep=False)
+    # Perform the division on the ridership block as one float array, dividing and rounding in place
+    ridership_block = df[services].to_numpy(dtype=float, copy=True)
+    ridership_block /= 1_000
+    np.round(ridership_block, out=ridership_block)
+    # Update only the ridership columns
+    df_thousands[services] = ridership_block
     return df_thousands
 
 
@@ -172,12 +113,16 @@ def resample_data(df: pd.DataFrame, granularity: str) -> pd.DataFrame:
         'Year': 'Y'
     }
     granularity_freq = granularity_freq_mapping.get(granularity, 'M')
-    # Convert DataFrame to string and write it to the file
+    # Daily data is already at the requested granularity, so there is nothing to aggregate
+    if granularity_freq is None:
+        return df.reset_index()
+
     # Resample the data based on the granularity frequency
     # Resample and aggregate data using mean
     resampled_df = df.resample(granularity_freq).mean()
-    # Round the resampled data before converting to integer
-    resampled_df = resampled_df.round().astype(int)
+    # Round the resampled data and convert it to integer in one pass over the numpy block
+    resampled_df = pd.DataFrame(np.rint(resampled_df.to_numpy()).astype(int),
+                                index=resampled_df.index, columns=resampled_df.columns)
     resampled_df.reset_index(inplace=True)
 
     if granularity == 'Year':
@@ -221,79 +166,65 @@ def create_metrics(granular_data: pd.DataFrame, selected_services: list) -> dict
     Returns:
         dict: The dictionary containing the metrics to store
     """
+    # Extract the last and second-last periods for all the services at once
+    previous_period_values, last_period_values = granular_data[selected_services].iloc[-2:].to_numpy()
+    percent_changes = np.round(
+        ((last_period_values - previous_period_values) / previous_period_values) * 100, 2)
+
+    # Format the last period ridership as millions or thousands, working on plain Python values
+    ridership_last_periods = [
+        '{:0.1f}M'.format(round(last_period_value/1_000, 1)) if last_period_value > 1_000
+        else '{:,}K'.format(int(last_period_value))
+        for last_period_value in last_period_values.tolist()
+    ]
+
     # Metrics Calculation
-    metrics = {}
-    for service in selected_services:
-        # Extract last and second-last periods for the service
-        last_period_value = granular_data[service].iloc[-1]
-        previous_period_value = granular_data[service].iloc[-2]
-        if last_period_value > 1_000:
-            ridership_last_period = '{:0.1f}M'.format(
-                round(last_period_value/1_000, 1))
-        else:
-            ridership_last_period = '{:,}K'.format(int(last_period_value))
-        percent_change = round(
-            ((last_period_value - previous_period_value) / previous_period_value) * 100, 2)
-
-        # Store metrics in the dictionary
-        metrics[service] = {
+    metrics = {
+        service: {
             'ridership_last_period': ridership_last_period,
             'percent_change': percent_change
         }
+        for service, ridership_last_period, percent_change in zip(selected_services, ridership_last_periods, percent_changes.tolist())
+    }
     return metrics
 
 
-def find_highest_ridership_day(df: pd.DataFrame) -> Tuple[str, str]:
+def find_highest_ridership_day(df: pd.DataFrame, daily_ridership: Optional[np.ndarray] = None) -> Tuple[str, str]:
     """
     Calculates the day with the highest ridership and the number of riders
 
     Args:
-        df         : The dataframe to use for calculating
-        granularity: The level of detail to use
+        df             : The dataframe to use for calculating
+        daily_ridership: Total ridership across all services for each row of df, computed if not given
 
     Returns:
         Tuple [str, str]: the highest ridership day, and the total ridership
     """
-# Define the post-pandemic start date
-    post_pandemic_start = pd.Timestamp('2020-03-01')
-
-    # Filter data to only include post-pandemic dates
-    post_pandemic_data = df[df['Date'] >= post_pandemic_start]
+    # Calculate total ridership across all services and find the row with the highest total
+    if daily_ridership is None:
+        daily_ridership = df[services].to_numpy().sum(axis=1)
+    highest_ridership_position = daily_ridership.argmax()
 
-    # Calculate total ridership across all services
-    post_pandemic_data['Total_Ridership'] = post_pandemic_data[services].sum(
-        axis=1)
-
-    # Find the row with the highest total ridership
-    highest_ridership = post_pandemic_data.loc[post_pandemic_data['Total_Ridership'].idxmax(
-    )]
-    highest_ridership_day = highest_ridership['Date'].strftime('%d %b %Y')
-    total_ridership = f"{highest_ridership['Total_Ridership'] // 1_000_000:.1f}M"
+    highest_ridership_day = pd.Timestamp(df['Date'].to_numpy()[highest_ridership_position]).strftime(
+        '%d %b %Y')
+    total_ridership = f"{daily_ridership[highest_ridership_position] // 1_000_000:.1f}M"
 
     return highest_ridership_day, total_ridership
 
 
-def calculate_yoy_growth(mta_data: pd.DataFrame, baseline_period: pd.Series, current_period: pd.Series, ridership_cols: list) -> float:
+def calculate_yoy_growth(baseline_totals: pd.Series, current_totals: pd.Series) -> float:
     """
     Calculate Year-on-Year growth for the latest period.
 
     Args:
-        mta_data (pd.DataFrame)    : DataFrame containing ridership data.
-        baseline_period (pd.Series): Boolean mask for the baseline period (e.g., October 2023).
-        current_period (pd.Series) : Boolean mask for the current period (e.g., October 2024).
-        ridership_cols (list)      : List of columns containing ridership values
+        baseline_totals (pd.Series): Ridership for each service over the baseline period (e.g., October 2023).
+        current_totals (pd.Series) : Ridership for each service over the current period (e.g., October 2024).
 
     Returns:
         float: The YoY growth rate as a percentage.
     """
-
-    # Calculate total ridership for the baseline period
-    baseline_ridership = calculate_baseline_ridership(
-        mta_data, ridership_cols, baseline_period)
-
-    # Calculate total ridership for the current period
-    current_ridership = calculate_current_ridership(
-        mta_data, ridership_cols, current_period)
+    baseline_ridership = baseline_totals.sum()
+    current_ridership = current_totals.sum()
 
     # Calculate YoY growth percentage
     if baseline_ridership > 0:
@@ -315,30 +246,29 @@ def prepare_comparison_table(mta_data: pd.DataFrame) -> pd.DataFrame:
     Returns:
         comparison_table: DataFrame with comparison metrics.
     """
-    # Convert Date to datetime
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'])
-
-    # Define time ranges
-    pre_pandemic_range = mta_data[mta_data['Date'] < '2020-03-11']
-    first_post_pandemic_range = mta_data[(mta_data['Date'].dt.year == 2021) & (
-        mta_data['Date'].dt.month == 10) & (mta_data['Date'].dt.day < 11)]
-    current_year_range = mta_data[(mta_data['Date'].dt.year == 2024) & (
-        mta_data['Date'].dt.month == 10) & (mta_data['Date'].dt.day < 11)]
-
-    # Identify ridership columns
-    ridership_cols = [
-        col for col in mta_data.columns if ': % of Pre-Pandemic' not in col and col != 'Date']
-
-    # Summarise data for ridership metrics
-    pre_pandemic_totals = pre_pandemic_range[ridership_cols].sum()
-    first_post_pandemic_totals = first_post_pandemic_range[ridership_cols].sum(
-    )
-    current_year_totals = current_year_range[ridership_cols].sum()
+    dates = mta_data['Date'].to_numpy()
+
+    # Label each row with the time range it belongs to, rows outside every range are left unlabelled
+    time_range = np.select(
+        [dates < pandemic_start,
+         (dates >= first_post_pandemic_period_start) & (dates < first_post_pandemic_period_end),
+         (dates >= current_period_start) & (dates < current_period_end)],
+        ['Pre-Pandemic', 'First Post-Pandemic Year', 'Current Year'],
+        default=None)
+
+    # Summarise data for ridership metrics, totals and averages for every time range in one group by
+    time_range_summary = mta_data[services].groupby(time_range).agg(['sum', 'mean'])
+    totals = time_range_summary.xs('sum', axis=1, level=1)
+    averages = time_range_summary.xs('mean', axis=1, level=1)
+
+    pre_pandemic_totals = totals.loc['Pre-Pandemic']
+    first_post_pandemic_totals = totals.loc['First Post-Pandemic Year']
+    current_year_totals = totals.loc['Current Year']
 
     # Calculate % of Pre-Pandemic as averages
-    pre_pandemic_averages = pre_pandemic_range[ridership_cols].mean()
-    post_pandemic_averages = first_post_pandemic_range[ridership_cols].mean()
-    current_year_averages = current_year_range[ridership_cols].mean()
+    pre_pandemic_averages = averages.loc['Pre-Pandemic']
+    post_pandemic_averages = averages.loc['First Post-Pandemic Year']
+    current_year_averages = averages.loc['Current Year']
 
     post_pandemic_percentage = (
         post_pandemic_averages / pre_pandemic_averages) * 100
@@ -347,7 +277,7 @@ def prepare_comparison_table(mta_data: pd.DataFrame) -> pd.DataFrame:
 
     # Create a comparison table
     comparison_table = pd.DataFrame({
-        'Service': ridership_cols,
+        'Service': services,
         'Pre-Pandemic': pre_pandemic_totals.values,
         'First Post-Pandemic Year': first_post_pandemic_totals.values,
         'Current Year': current_year_totals.values,
@@ -364,54 +294,44 @@ def prepare_comparison_table(mta_data: pd.DataFrame) -> pd.DataFrame:
         raise ValueError(f"The following expected columns are missing: {missing_columns}")
 
     # Format the table
-    # Format numeric columns with commas and round percentages
-    comparison_table['Pre-Pandemic'] = comparison_table['Pre-Pandemic'].map(
-        '{:,.0f}'.format)
-    comparison_table['First Post-Pandemic Year'] = comparison_table['First Post-Pandemic Year'].map(
-        '{:,.0f}'.format)
-    comparison_table['Current Year'] = comparison_table['Current Year'].map(
-        '{:,.0f}'.format)
-
-    # Format percentage columns with 1 decimal place
-    comparison_table['% of Pre-Pandemic (Post)'] = comparison_table['% of Pre-Pandemic (Post)'].map(
-        '{:.1f}%'.format)
-    comparison_table['% of Pre-Pandemic (Current)'] = comparison_table['% of Pre-Pandemic (Current)'].map(
-        '{:.1f}%'.format)
+    # Format numeric columns with commas and percentage columns with 1 decimal place
+    column_formats = {
+        'Pre-Pandemic': '{:,.0f}',
+        'First Post-Pandemic Year': '{:,.0f}',
+        'Current Year': '{:,.0f}',
+        '% of Pre-Pandemic (Post)': '{:.1f}%',
+        '% of Pre-Pandemic (Current)': '{:.1f}%',
+    }
+    for column, column_format in column_formats.items():
+        comparison_table[column] = [column_format.format(value)
+                                    for value in comparison_table[column].tolist()]
 
     return comparison_table
 
 
-def create_average_rideships(mta_data: pd.DataFrame) -> Tuple[str, str]:
+def create_average_rideships(mta_data: pd.DataFrame, daily_ridership: Optional[np.ndarray] = None) -> Tuple[str, str]:
     """
     Calculates the average rideships for lockdown and post lockdown periods
 
     Args:
-        mta_data: DataFrame with ridership values by service and time.
+        mta_data       : DataFrame with ridership values by service and time.
+        daily_ridership: Total ridership across all services for each row of mta_data, computed if not given
 
     Returns:
         Tuple[str, str]: the formatted ridership values
     """
-    lockdown_start = '2020-03-11'
-    lockdown_end = '2020-06-08'  # Last day of lockdown
-    post_lockdown_start = '2020-06-09'  # First day of post-lockdown
-    ridership_cols = [
-        col for col in mta_data.columns if ': % of Pre-Pandemic' not in col and col != 'Date']
-
-    # Convert 'Date' column to datetime if not already
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'])
+    # Calculate the total ridership for each day once for both periods
+    if daily_ridership is None:
+        daily_ridership = mta_data[services].to_numpy().sum(axis=1)
 
     # Filter the data
-    lockdown_data = mta_data[(mta_data['Date'] >= lockdown_start) & (
-        mta_data['Date'] <= lockdown_end)]
-    post_lockdown_data = mta_data[mta_data['Date'] >= post_lockdown_start]
-
-    # Identify ridership columns
-    ridership_cols = [
-        col for col in mta_data.columns if ': % of Pre-Pandemic' not in col and col != 'Date']
+    lockdown_period = ((mta_data['Date'] >= pandemic_start) & (
+        mta_data['Date'] <= lockdown_end)).to_numpy()
+    post_lockdown_period = (mta_data['Date'] >= post_lockdown_start).to_numpy()
 
     # Calculate averages
-    average_ridership_lockdown = f"{lockdown_data[ridership_cols].sum(axis=1).mean():,.0f}"
-    average_ridership_post_lockdown = f"{post_lockdown_data[ridership_cols].sum(axis=1).mean():,.0f}"
+    average_ridership_lockdown = f"{daily_ridership[lockdown_period].mean():,.0f}"
+    average_ridership_post_lockdown = f"{daily_ridership[post_lockdown_period].mean():,.0f}"
 
     return average_ridership_lockdown, average_ridership_post_lockdown
 
@@ -421,35 +341,40 @@ def create_kpis(mta_data: pd.DataFrame) -> dict:
     Creates the dictionary of KPIs for storing for later use.
 
     Args:
-        mta_data: The complete MTA DataFrame with recovery percentage columns and a time column.
+        mta_data: The complete MTA DataFrame with recovery percentage columns and a time column, in date order.
 
     Returns:
-        Figure: Plotly Figure object with the dual axis chart.
+        dict: The formatted KPI values keyed by name
     """
-    ridership_cols = [
-        col for col in mta_data.columns if ': % of Pre-Pandemic' not in col and col != 'Date']
+    # The rows are in date order, so each period is a contiguous run of rows found by binary search
+    dates = mta_data['Date'].to_numpy()
+    period_bounds = np.searchsorted(dates, [
+        [dates[0], pandemic_start],  # Baseline period: dates < 11/03/2020
+        [current_period_start, current_period_end],  # Current period: 1-10 October 2024
+        [previous_october_start, previous_october_end],  # October 2023
+        [current_october_start, current_october_end],  # October 2024
+    ])
+
+    # Extract the ridership block once and sum every service over each KPI period from it
+    ridership_block = mta_data[services].to_numpy()
+    baseline_totals, current_totals, previous_october_totals, current_october_totals = (
+        pd.Series(ridership_block[period_start:period_end].sum(axis=0), index=services)
+        for period_start, period_end in period_bounds)
+    daily_ridership = ridership_block.sum(axis=1)
 
     # Metrics Calculations
     highest_ridership_day, total_ridership = find_highest_ridership_day(
-        mta_data)
-    total_recovery = f"{calculate_total_recovery(mta_data, ridership_cols):.1f}%"
+        mta_data, daily_ridership)
+    total_recovery = f"{calculate_total_recovery(baseline_totals, current_totals):.1f}%"
 
-    baseline_period = (mta_data['Date'] < '2020-03-11')
-    current_period = (mta_data['Date'].dt.year == 2024) & (
-        mta_data['Date'].dt.month == 10) & (mta_data['Date'].dt.day < 11)
     top_service, recovery_percentage = calculate_top_service_recovery(
-        mta_data, baseline_period, current_period)
-
-    baseline_period = (mta_data['Date'].dt.year == 2023) & (
-        mta_data['Date'].dt.month == 10)
-    current_period = (mta_data['Date'].dt.year == 2024) & (
-        mta_data['Date'].dt.month == 10)
+        baseline_totals, current_totals)
 
     yoy_growth = calculate_yoy_growth(
-        mta_data, baseline_period, current_period, ridership_cols)
+        previous_october_totals, current_october_totals)
 
     average_ridership_lockdown, average_ridership_post_lockdown = create_average_rideships(
-        mta_data)
+        mta_data, daily_ridership)
     kpis = {
         'total_ridership': total_ridership,
         'highest_ridership_day': highest_ridership_day,
@@ -1,12 +1,16 @@
 import pandas as pd
+import numpy as np
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
-from scipy.stats import linregress
 
 from config import (
     services,
+    granularities,
+    pandemic_start,
+    current_period_start,
+    current_period_end,
     service_colours,
     dark_blue,
     dark_orange
@@ -112,10 +116,7 @@ def create_granularity_dropdown() -> list:
             [
                 dcc.Markdown('Select a Report Granularity:'),
                 dcc.Dropdown(
-                    ['Month',
-                     'Quarter',
-                     'Year'
-                     ],
+                    granularities,
                     'Month',
                     id='granularity_dropdown',
                     multi=False,
@@ -172,13 +173,17 @@ def create_sparkline(granular_data: pd.DataFrame, service: list, granularity: st
     Returns:
         sparkline_figure: A Plotly Go Objects line chart
     '''
+    # The resampled data is sorted by date, so the last year starts at a single position
     if granularity == 'Year':
-        max_date = granular_data['Year'].max()
-        last_year_data = granular_data[granular_data['Year'] >= max_date - 1]
+        years = granular_data['Year'].to_numpy()
+        start = np.searchsorted(years, years[-1] - 1, side='left')
     else:
-        max_date = granular_data['Date'].max()
-        last_year_data = granular_data[granular_data['Date']
-                                       > max_date - pd.DateOffset(years=1)]
+        dates = granular_data['Date'].to_numpy()
+        # The one year offset is applied once to the latest date, not to every row
+        cutoff = (pd.Timestamp(dates[-1]) - pd.DateOffset(years=1)).to_datetime64()
+        start = np.searchsorted(dates, cutoff, side='right')
+    # Only the dates and the service are plotted, so only those columns are sliced
+    last_year_data = granular_data[['Date', service]].iloc[start:]
 
     percent_change = metrics[service]['percent_change']
     if percent_change >= 0:
@@ -194,10 +199,8 @@ def create_sparkline(granular_data: pd.DataFrame, service: list, granularity: st
             mode='lines',
             line=dict(width=2, color=line_colour),
             showlegend=False,
-            # Format text to display ridership values
-            text=last_year_data[service].apply(lambda x: f'{x:,.0f}'),
-            # Display the ridership value on hover
-            hovertemplate='%{text}<extra></extra>',
+            # Display the ridership value on hover, formatted by Plotly in the browser
+            hovertemplate='%{y:,.0f}<extra></extra>',
         )
     )
     sparkline_figure.update_layout(
@@ -230,7 +233,7 @@ def create_kpi_cards(kpis):
     Returns:
         cards: A list containing the cards to display on the row
     '''
-    logging.debug(f"Started create_kpi_cards with: {kpis}")
+    logging.debug('Started create_kpi_cards with: %s', kpis)
     if not isinstance(kpis, dict):
         logging.error(f"kpis is not a dictionary. Received: {kpis}")
         raise TypeError("kpis must be a dictionary.")
@@ -240,13 +243,6 @@ def create_kpi_cards(kpis):
         raise KeyError("Missing key 'total_ridership' in kpis.")
 
     # Proceed with creating cards
-    total_ridership = kpis["total_ridership"]
-    highest_ridership_day = kpis["highest_ridership_day"]
-    total_recovery = kpis["total_recovery"]
-    top_service = kpis["top_service"]
-    recovery_percentage = kpis["recovery_percentage"]
-
-    # Continue with the card creation logic
     # Set the height of the cards for all the cards on this row
     card_height = '100px'
     detail_font_weight = '600'
@@ -551,10 +547,10 @@ def create_kpi_cards(kpis):
 
 
 def create_ridership_cards(granular_data: pd.DataFrame, selected_services: list, granularity: str, metrics: dict) -> go.Figure:
-
-    logging.debug(f'Granular Data: {granular_data.head()}')
-    logging.debug(f'Selected Services: {selected_services}')
-    logging.debug(f'Metrics: {metrics}')
+    # Pass the values as logging arguments so they are only formatted when debug logging is enabled
+    logging.debug('Granular Data: %s', granular_data.head())
+    logging.debug('Selected Services: %s', selected_services)
+    logging.debug('Metrics: %s', metrics)
 
     card_height = '210px'
     up_arrow = chr(8593)  # Upward arrow (↑)
@@ -565,32 +561,35 @@ def create_ridership_cards(granular_data: pd.DataFrame, selected_services: list,
     trimmed_services = selected_services[:4] + [selected_services[5]] if len(
         selected_services) > 5 else selected_services
 
+    # Styles and arrow for a rise, a fall and no change, keyed by the sign of the change and shared by the cards
+    change_styles = {
+        1: (
+            {'font-size': '2em', 'font-weight': 'bold',
+             'text-align': 'center', 'color': dark_blue},
+            {'margin-bottom': '0.2em', 'color': dark_blue},
+            f' {up_arrow}'
+        ),
+        -1: (
+            {'font-size': '2em', 'font-weight': 'bold',
+             'text-align': 'center', 'color': dark_orange},
+            {'margin-bottom': '0.2em', 'color': dark_orange},
+            f' {down_arrow}'
+        ),
+        0: (
+            {'font-size': '2em', 'font-weight': 'bold', 'text-align': 'center'},
+            {'margin-bottom': '0.2em'},
+            ''
+        ),
+    }
+
     for service in trimmed_services:
         ridership_last_period = metrics[service]['ridership_last_period']
         percent_change = metrics[service]['percent_change']
 
         # Set style based on change
-        if percent_change > 0:
-            card_text_style = {
-                'font-size': '2em', 'font-weight': 'bold',
-                'text-align': 'center', 'color': dark_blue
-            }
-            percent_change_style = {
-                'margin-bottom': '0.2em', 'color': dark_blue}
-            percent_change_text = f'% Change: {percent_change:.1f}% {up_arrow}'
-        elif percent_change < 0:
-            card_text_style = {
-                'font-size': '2em', 'font-weight': 'bold',
-                'text-align': 'center', 'color': dark_orange
-            }
-            percent_change_style = {
-                'margin-bottom': '0.2em', 'color': dark_orange}
-            percent_change_text = f'% Change: {percent_change:.1f}% {down_arrow}'
-        else:
-            card_text_style = {'font-size': '2em',
-                               'font-weight': 'bold', 'text-align': 'center'}
-            percent_change_style = {'margin-bottom': '0.2em'}
-            percent_change_text = f'% Change: {percent_change:.1f}%'
+        card_text_style, percent_change_style, arrow = change_styles[
+            (percent_change > 0) - (percent_change < 0)]
+        percent_change_text = f'% Change: {percent_change:.1f}%{arrow}'
 
         cards.append(
             dbc.Col(
@@ -605,8 +604,9 @@ def create_ridership_cards(granular_data: pd.DataFrame, selected_services: list,
                                style=percent_change_style),
                         dcc.Graph(
                             id=f'{service.lower().replace(" ", "_").replace("-", "_")}_sparkline',
+                            # Keep the figure as a dict so cached cards do not validate it again when unpickled
                             figure=create_sparkline(
-                                granular_data, service, granularity, metrics),
+                                granular_data, service, granularity, metrics).to_dict(),
                             config={'displayModeBar': False,
                                     'responsive': True},
                             style={
@@ -643,13 +643,13 @@ def create_service_line_chart(granular_data: pd.DataFrame, granularity: str, sel
         fig: A Plotly Graph Objects figure.
     '''
     if granularity == 'Year':
-        granular_data['Year'] = granular_data['Year'].astype(str)
-        x_axis_values = granular_data['Year']  # Use the 'Year' column directly
+        # Cast the years to strings locally rather than writing them back into granular_data
+        x_axis_values = granular_data['Year'].to_numpy().astype(str)
     else:
         x_axis_values = granular_data['Date']  # Use the 'Date' column directly
 
     if granularity == 'Year':
-        formatted_labels = granular_data['Year']
+        formatted_labels = x_axis_values
     elif granularity == 'Quarter':
         formatted_labels = [
             f'{date.year}-Q{((date.month - 1) // 3) + 1}' for date in granular_data['Date']
@@ -660,10 +660,7 @@ def create_service_line_chart(granular_data: pd.DataFrame, granularity: str, sel
     max_labels = 12 if granularity == 'Month' else 8
     label_step = max(1, len(granular_data) // max_labels)
 
-    if granularity == 'Year':
-        x_axis_tickvals = granular_data['Year'][::label_step]
-    else:
-        x_axis_tickvals = granular_data['Date'][::label_step]
+    x_axis_tickvals = x_axis_values[::label_step]
 
     x_axis_ticktext = [formatted_labels[i] for i in range(0, len(formatted_labels), label_step)]
 
@@ -777,9 +774,6 @@ def create_service_line_chart(granular_data: pd.DataFrame, granularity: str, sel
     return fig
 
 
-import plotly.graph_objects as go
-import pandas as pd
-
 def create_correlation_matrix(granular_data: pd.DataFrame, granularity) -> go.Figure:
     '''
     Creates a correlation matrix with a heatmap colouring.
@@ -792,25 +786,30 @@ def create_correlation_matrix(granular_data: pd.DataFrame, granularity) -> go.Fi
         fig:  Plotly Figure object with the heatmap.
     '''
     # Filter and process data based on granularity
-    filtered_cols = [col for col in granular_data.columns if not any(
-        p in col.lower() for p in ['% of pre-pandemic', '% pre-pandemic'])]
-    df_filtered = granular_data[filtered_cols]
+    recovery_cols = granular_data.columns.str.contains(r'% (?:of )?pre-pandemic', case=False)
+    df_filtered = granular_data.loc[:, ~recovery_cols]
 
-    # Calculate correlation
     if granularity == 'Year':
         df_filtered = df_filtered.iloc[:, 1:-1]
     else:
-        df_filtered = df_filtered.iloc[:, 1:].corr().round(2)
+        df_filtered = df_filtered.iloc[:, 1:]
 
-    correlation_matrix = df_filtered.corr().round(2)
+    # Calculate correlation on the ridership block as a NumPy array
+    correlation_matrix = pd.DataFrame(
+        np.corrcoef(df_filtered.to_numpy(dtype=float), rowvar=False).round(2),
+        index=df_filtered.columns,
+        columns=df_filtered.columns
+    )
     min_value = correlation_matrix.min().min()
+    flipped_values = correlation_matrix.values[::-1, :]  # Reverse the z values to align with the y-axis flip
+    flipped_index = correlation_matrix.index[::-1]  # Flip y-axis to get diagonal top-left to bottom-right
 
     # Create heatmap with Plotly (flip the z values to match the reversed y-axis)
     fig = go.Figure(
         data=go.Heatmap(
-            z=correlation_matrix.values[::-1, :],  # Reverse the z values to align with the y-axis flip
+            z=flipped_values,
             x=correlation_matrix.columns,
-            y=correlation_matrix.index[::-1],  # Flip y-axis to get diagonal top-left to bottom-right
+            y=flipped_index,
             colorscale='RdBu_r',  # Negative values are blue, positive values are red
             zmin=min_value,
             zmax=1,
@@ -821,9 +820,8 @@ def create_correlation_matrix(granular_data: pd.DataFrame, granularity) -> go.Fi
 
     # Add annotations for each cell to dynamically set text color
     annotations = []
-    for i, row in enumerate(correlation_matrix.index[::-1]):  # Reverse index to match heatmap
-        for j, col in enumerate(correlation_matrix.columns):
-            value = correlation_matrix.values[::-1, :][i][j]  # Reverse values accordingly
+    for row, row_values in zip(flipped_index, flipped_values.tolist()):  # Reversed to match heatmap
+        for col, value in zip(correlation_matrix.columns, row_values):
 
             # Set dynamic color based on value (blue cells need white text)
             text_color = 'white' if value < -0.5 or value > 0.7 else '#404040'
@@ -882,21 +880,15 @@ def create_dual_axis_chart(granular_data: pd.DataFrame, granularity: str, select
         fig: Plotly Figure object with the dual axis chart.
     '''
 
+    # Every trace shares the same x values, so they are taken as an array once
     if granularity == 'Year':
-        granular_data['Year'] = granular_data['Year'].astype(str)
-        x_axis_values = granular_data['Year']  # Use the 'Year' column directly
+        # Cast the years to strings locally rather than writing them back into granular_data
+        x_axis_values = granular_data['Year'].to_numpy().astype(str)
     else:
-        x_axis_values = granular_data['Date']  # Use the 'Date' column directly
-
+        x_axis_values = granular_data['Date'].to_numpy()  # Use the 'Date' column directly
 
     if granularity == 'Year':
-        granular_data['Year'] = granular_data['Year'].astype(str)
-        x_axis_values = granular_data['Year']  # Use the 'Year' column directly
-    else:
-        x_axis_values = granular_data['Date']  # Use the 'Date' column directly
-
-    if granularity == 'Year':
-        formatted_labels = granular_data['Year']
+        formatted_labels = x_axis_values
     elif granularity == 'Quarter':
         formatted_labels = [
             f'{date.year}-Q{((date.month - 1) // 3) + 1}' for date in granular_data['Date']
@@ -907,19 +899,16 @@ def create_dual_axis_chart(granular_data: pd.DataFrame, granularity: str, select
     max_labels = 12 if granularity == 'Month' else 8
     label_step = max(1, len(granular_data) // max_labels)
 
-    if granularity == 'Year':
-        x_axis_tickvals = granular_data['Year'][::label_step]
-    else:
-        x_axis_tickvals = granular_data['Date'][::label_step]
+    x_axis_tickvals = x_axis_values[::label_step]
 
     x_axis_ticktext = [formatted_labels[i] for i in range(0, len(formatted_labels), label_step)]
 
-
-
     # Create the dual-axis chart
     fig = make_subplots(specs=[[{'secondary_y': True}]])
 
     for service in selected_services:
+        # Full service name for the tooltip, shared by both of the service's traces
+        service_customdata = [service] * len(granular_data)
         fig.add_trace(
             go.Scatter(
                 x=x_axis_values,
@@ -927,8 +916,7 @@ def create_dual_axis_chart(granular_data: pd.DataFrame, granularity: str, select
                 mode='lines',
                 name=f'{service} Ridership',
                 line=dict(color=service_colours[service]['colour']),
-                # Add full service name for tooltip
-                customdata=[service] * len(granular_data),
+                customdata=service_customdata,
                 hovertemplate=(
                     # Show full service name
                     '<b>Service:</b> %{customdata}<br>'
@@ -949,8 +937,7 @@ def create_dual_axis_chart(granular_data: pd.DataFrame, granularity: str, select
                 name=f'{service} Recovery %',
                 line=dict(
                     color=service_colours[service]['tinted_colour'], dash='dot'),
-                # Add full service name for tooltip
-                customdata=[service] * len(granular_data),
+                customdata=service_customdata,
                 hovertemplate=(
                     # Show full service name
                     '<b>Service:</b> %{customdata}<br>'
@@ -1020,19 +1007,10 @@ def create_recovery_bar_chart(mta_data: pd.DataFrame) -> go.Figure:
         fig: Plotly Figure object with the bar chart.
     '''
 
-    baseline_period = (mta_data['Date'] < '2020-03-11')
-
-    current_period = (mta_data['Date'].dt.year == 2024) & (
-        mta_data['Date'].dt.month == 10) & (mta_data['Date'].dt.day < 11)
-
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'], format='%m/%d/%Y')
-
-    # Select relevant columns: ridership data and pre-pandemic percentage columns
-    services = [col.split(':')[0]
-                for col in mta_data.columns if ': % of Pre-Pandemic' in col]
-
-    # Calculate recovery for each service
-    recovery_percentages = {}
+    # Masks for the baseline and current periods, the Date column is already parsed
+    dates = mta_data['Date'].to_numpy()
+    baseline_period = dates < pandemic_start
+    current_period = (dates >= current_period_start) & (dates < current_period_end)  # 1-10 October 2024
 
     comments_dict = {
     service: (
@@ -1047,24 +1025,21 @@ def create_recovery_bar_chart(mta_data: pd.DataFrame) -> go.Figure:
     for service in services
 }
 
-    for service in services:
-        baseline_ridership = mta_data.loc[baseline_period, service].sum()
-        current_ridership = mta_data.loc[current_period, service].sum()
-        # Calculate recovery percentage for the service
-        if baseline_ridership > 0:
-            recovery_percentage = round(
-                (current_ridership / baseline_ridership) * 100, 1)
-        else:
-            recovery_percentage = 0
-
-        recovery_percentages[service] = recovery_percentage
-
-   # Set the bar colours from the service_colours dictionary
+    # Calculate recovery for every service at once from the baseline and current period sums
+    ridership_values = mta_data[services].to_numpy()
+    baseline_ridership = ridership_values[baseline_period].sum(axis=0)
+    current_ridership = ridership_values[current_period].sum(axis=0)
+    recovery_percentages = np.round(np.divide(
+        current_ridership, baseline_ridership,
+        out=np.zeros(len(services)), where=baseline_ridership > 0) * 100, 1)
+
+    # Set the bar colours from the service_colours dictionary
     bar_colours = [service_colours[service]['colour'] for service in services]
 
-    # Calculate the average recovery
-    average_recovery = pd.Series(recovery_percentages).sort_values(ascending=True)
-    aligned_services = average_recovery.index.tolist()
+    # Sort the services by their recovery, lowest first
+    sort_order = np.argsort(recovery_percentages)
+    average_recovery = recovery_percentages[sort_order]
+    aligned_services = [services[i] for i in sort_order]
     #formatted_recovery = [f'{value:.1f}%' for value in average_recovery]
     # Assign Values to Customdata from dictionary
     comments = [comments_dict[service] for service in aligned_services]
@@ -1077,7 +1052,7 @@ def create_recovery_bar_chart(mta_data: pd.DataFrame) -> go.Figure:
             x=average_recovery,  # Recovery percentages on the x-axis
             y=aligned_services,  # Services on the y-axis
             # Add text labels for percentages with one decimal place
-            text=average_recovery.round(1).astype(str) + '%',
+            text=[f'{value}%' for value in average_recovery.tolist()],
             textposition='auto',
             marker=dict(color=bar_colours),  # Set bar color
             orientation='h',  # Horizontal orientation
@@ -1149,42 +1124,34 @@ def create_recovery_heatmap(granular_data: pd.DataFrame, granularity: str) -> go
     # Determine the time column based on granularity
     time_column = 'Year' if granularity == 'Year' else 'Date'
 
-    # Pivot the data: Time in columns, services in rows
-    heatmap_data = granular_data.melt(
-        id_vars=[time_column],
-        value_vars=services,
-        var_name='Service',
-        value_name='Recovery Ridership'
-    )
-    heatmap_pivot = heatmap_data.pivot(
-        index='Service', columns=time_column, values='Recovery Ridership'
-    )
+    # Time in columns, services in rows (alphabetical), taken straight from the ridership block
+    time_periods = pd.Index(granular_data[time_column])
+    heatmap_services = sorted(services)
+    ridership_values = granular_data[heatmap_services].to_numpy(dtype=float).T
 
     # Normalize each service's ridership to its own maximum
-    normalized_heatmap_pivot = heatmap_pivot.apply(lambda x: (x / x.max()) * 100, axis=1).fillna(0)
+    normalized_ridership = np.nan_to_num(
+        (ridership_values / ridership_values.max(axis=1, keepdims=True)) * 100, nan=0)
+
+    # Handle axis label optimization for Month or Quarter
+    max_labels = 12 if granularity == 'Month' else 8
+    label_step = max(1, len(time_periods) // max_labels)
+    x_axis_tickvals = time_periods[::label_step]
 
-    # Format x-axis labels based on granularity
+    # Format only the x-axis labels that are shown, based on granularity
     if granularity == 'Year':
-        formatted_labels = [str(int(year)) for year in normalized_heatmap_pivot.columns]
+        x_axis_ticktext = x_axis_tickvals.astype(int).astype(str).tolist()
     elif granularity == 'Quarter':
-        formatted_labels = [
-            f'{col.year}-Q{((col.month - 1) // 3) + 1}' for col in normalized_heatmap_pivot.columns
-        ]
+        x_axis_ticktext = x_axis_tickvals.to_period('Q').strftime('%Y-Q%q').tolist()
     else:  # Month
-        formatted_labels = [col.strftime('%Y-%b') for col in normalized_heatmap_pivot.columns]
-
-    # Handle axis label optimization for Month or Quarter
-    max_labels = 12 if granularity == 'Month' else 8
-    label_step = max(1, len(normalized_heatmap_pivot.columns) // max_labels)
-    x_axis_tickvals = normalized_heatmap_pivot.columns[::label_step]
-    x_axis_ticktext = [formatted_labels[i] for i in range(0, len(formatted_labels), label_step)]
+        x_axis_ticktext = x_axis_tickvals.strftime('%Y-%b').tolist()
 
     # Create the heatmap with normalized values
     fig = go.Figure(
         data=go.Heatmap(
-            z=normalized_heatmap_pivot.values,
-            x=normalized_heatmap_pivot.columns,
-            y=normalized_heatmap_pivot.index,
+            z=normalized_ridership,
+            x=time_periods,
+            y=heatmap_services,
             colorscale='RdBu',
             colorbar=dict(title='Recovery Percentage', len=0.5),
             zmin=0,  # Minimum percentage is 0%
@@ -1244,23 +1211,15 @@ def create_ridership_pie_chart(mta_data: pd.DataFrame) -> go.Figure:
         fig: Plotly Figure object with the pie charts.
     '''
 
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'], format='%m/%d/%Y')
-
-    # Identify ridership columns
-    ridership_cols = [
-        col for col in mta_data.columns if ': % of Pre-Pandemic' not in col and col != 'Date']
-
-    # Filter the dataset to the pre- and post-pandemic date ranges
-    pre_pandemic_data = mta_data[mta_data['Date'] < '2020-03-11']
-    post_pandemic_data = mta_data[
-        (mta_data['Date'].dt.year == 2024) &
-        (mta_data['Date'].dt.month == 10) &
-        (mta_data['Date'].dt.day < 11)
-    ]
+    # Masks for the pre- and post-pandemic date ranges, the Date column is already parsed
+    dates = mta_data['Date'].to_numpy()
+    pre_pandemic_period = dates < pandemic_start
+    post_pandemic_period = (dates >= current_period_start) & (dates < current_period_end)  # 1-10 October 2024
 
-    # Sum ridership values for pre- and post-pandemic periods
-    pre_pandemic_totals = pre_pandemic_data[ridership_cols].sum()
-    post_pandemic_totals = post_pandemic_data[ridership_cols].sum()
+    # Sum ridership values for pre- and post-pandemic periods over the service columns
+    ridership_values = mta_data[services].to_numpy()
+    pre_pandemic_totals = ridership_values[pre_pandemic_period].sum(axis=0)
+    post_pandemic_totals = ridership_values[post_pandemic_period].sum(axis=0)
 
     # Compute the total ridership for both periods
     total_pre_pandemic = pre_pandemic_totals.sum()
@@ -1269,52 +1228,46 @@ def create_ridership_pie_chart(mta_data: pd.DataFrame) -> go.Figure:
     # Set the bar colours from the service_colours dictionary
     slice_colours = [service_colours[service]['colour']
                      for service in services]
-    # Create a figure
-    fig = go.Figure()
     chart_type = 'Pre-Pandemic'
-    # Add pre-pandemic pie chart
-    fig.add_trace(
-        go.Pie(
-            labels=pre_pandemic_totals.index,
-            values=pre_pandemic_totals.values,
-            name=chart_type,
-            hole=0.60,
-            sort=True,
-            direction='clockwise',
-            marker=dict(colors=slice_colours),
-            hoverinfo='skip',  # Skip default hover info to use hovertemplate
-            hovertemplate=(
-                f'<b>Chart Type:</b> {chart_type}<br>'  # Add chart type to tooltip
-                '<b>Service:</b> %{label}<br>'         # Service name
-                '<b>Ridership:</b> %{value:,}<br>'     # Ridership value with commas
-                '<b>Percentage:</b> %{percent:.1%}<extra></extra>'  # Percentage
-            )
+    # Create the pre-pandemic pie chart
+    pre_pandemic_pie = go.Pie(
+        labels=services,
+        values=pre_pandemic_totals,
+        name=chart_type,
+        hole=0.60,
+        sort=True,
+        direction='clockwise',
+        marker=dict(colors=slice_colours),
+        hoverinfo='skip',  # Skip default hover info to use hovertemplate
+        hovertemplate=(
+            f'<b>Chart Type:</b> {chart_type}<br>'  # Add chart type to tooltip
+            '<b>Service:</b> %{label}<br>'         # Service name
+            '<b>Ridership:</b> %{value:,}<br>'     # Ridership value with commas
+            '<b>Percentage:</b> %{percent:.1%}<extra></extra>'  # Percentage
         )
     )
 
-    # Add post-pandemic pie chart
-
+    # Create the post-pandemic pie chart, initially hidden
     chart_type = 'Post-Pandemic'
-    fig.add_trace(
-        go.Pie(
-            labels=post_pandemic_totals.index,
-            values=post_pandemic_totals.values,
-            name=chart_type,
-            hole=0.60,
-            sort=True,
-            direction='clockwise',
-            marker=dict(colors=slice_colours),
-            hoverinfo='skip',  # Skip default hover info to use hovertemplate
-            hovertemplate=(
-                f'<b>Chart Type:</b> {chart_type}<br>'  # Add chart type to tooltip
-                '<b>Service:</b> %{label}<br>'         # Service name
-                '<b>Ridership:</b> %{value:,}<br>'     # Ridership value with commas
-                '<b>Percentage:</b> %{percent:.1%}<extra></extra>'  # Percentage
-            )
+    post_pandemic_pie = go.Pie(
+        labels=services,
+        values=post_pandemic_totals,
+        name=chart_type,
+        visible=False,
+        hole=0.60,
+        sort=True,
+        direction='clockwise',
+        marker=dict(colors=slice_colours),
+        hoverinfo='skip',  # Skip default hover info to use hovertemplate
+        hovertemplate=(
+            f'<b>Chart Type:</b> {chart_type}<br>'  # Add chart type to tooltip
+            '<b>Service:</b> %{label}<br>'         # Service name
+            '<b>Ridership:</b> %{value:,}<br>'     # Ridership value with commas
+            '<b>Percentage:</b> %{percent:.1%}<extra></extra>'  # Percentage
         )
     )
-    # Initially show only pre-pandemic chart
-    fig.data[1].visible = False
+    # Build the figure from both traces in one go, only the pre-pandemic chart is shown initially
+    fig = go.Figure(data=[pre_pandemic_pie, post_pandemic_pie])
 
     # Define annotations for the total ridership values
     pre_pandemic_annotation = dict(
@@ -1458,28 +1411,40 @@ def create_ridership_scatterplot(mta_data: pd.DataFrame, selected_services: list
     Returns:
         fig: Plotly Figure object with scatter plots and trendlines for the selected services.
     '''
+    # Perform the linear regression for every selected service's trendline at once
+    # Convert dates to day numbers for regression, taken straight from the datetime64 values
+    x = mta_data['Date'].to_numpy().astype('datetime64[D]').astype(float)[:, np.newaxis]
+    ridership_values = mta_data[selected_services].to_numpy(dtype=float)
+    # Missing days are left out of each service's fit, as dropna did for the single service fits
+    has_value = ~np.isnan(ridership_values)
+    day_counts = has_value.sum(axis=0)
+    x_means = np.where(has_value, x, 0).sum(axis=0) / day_counts
+    y_means = np.where(has_value, ridership_values, 0).sum(axis=0) / day_counts
+    x_deviations = np.where(has_value, x - x_means, 0)
+    y_deviations = np.where(has_value, ridership_values - y_means, 0)
+    slopes = (x_deviations * y_deviations).sum(axis=0) / (x_deviations ** 2).sum(axis=0)
+    intercepts = y_means - slopes * x_means
+
     # Create a figure
     fig = go.Figure()
 
     # Loop through the selected services
-    for service in selected_services:
-        # Filter the data for the selected service
-        service_data = mta_data[['Date', service]].dropna()
-
-        # Perform linear regression for the trendline
-        # Convert dates to ordinal numbers for regression
-        x = service_data['Date'].map(pd.Timestamp.toordinal)
-        y = service_data[service]
-        slope, intercept, r_value, p_value, std_err = linregress(x, y)
-
-        # Calculate the trendline
-        trendline_y = slope * x + intercept
-
-        # Scatter plot for the selected service's ridership
+    dates = mta_data['Date']
+    for service_index, (service, slope, intercept) in enumerate(zip(selected_services, slopes, intercepts)):
+        # Filter the data for the selected service with the mask from the regression rather than a dropna copy
+        service_has_value = has_value[:, service_index]
+        service_dates = dates[service_has_value]
+        service_ridership = mta_data[service][service_has_value]
+
+        # The trendline is straight so only its end points need to be sent to the browser
+        trendline_x = service_dates.agg(['min', 'max'])
+        trendline_y = slope * trendline_x.to_numpy().astype('datetime64[D]').astype(float) + intercept
+
+        # Scatter plot for the selected service's ridership, drawn with WebGL as it has a marker per day
         fig.add_trace(
-            go.Scatter(
-                x=service_data['Date'],
-                y=service_data[service],
+            go.Scattergl(
+                x=service_dates,
+                y=service_ridership,
                 mode='markers',
                 name=f'{service} Ridership',
                 marker=dict(
@@ -1488,11 +1453,9 @@ def create_ridership_scatterplot(mta_data: pd.DataFrame, selected_services: list
                 ),
                 showlegend=True,
 
-                # Add full service name for tooltip
-                customdata=[service] * len(mta_data),
                 hovertemplate=(
                     # Show full service name
-                    '<b>Service:</b> %{customdata}<br>'
+                    f'<b>Service:</b> {service}<br>'
                     # Format date nicely
                     '<b>Date:</b> %{x|%d %B %Y}<br>'
                     # Format ridership with commas
@@ -1504,7 +1467,7 @@ def create_ridership_scatterplot(mta_data: pd.DataFrame, selected_services: list
         # Add the trendline for the selected service
         fig.add_trace(
             go.Scatter(
-                x=service_data['Date'],
+                x=trendline_x,
                 y=trendline_y,
                 mode='lines',
                 name=f'{service} Trendline',
@@ -1565,37 +1528,25 @@ def create_before_after_chart(mta_data: pd.DataFrame, services: list) -> go.Figu
     Returns:
         fig: Plotly Figure object.
     '''
-    # Convert dates to datetime for filtering
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'], format='%m/%d/%Y')
-
-    # Filter for pre-pandemic and post-pandemic date ranges
-    pre_pandemic_data = mta_data[mta_data['Date'] < '2020-03-11']
-    post_pandemic_data = mta_data[
-        (mta_data['Date'].dt.year == 2024) &
-        (mta_data['Date'].dt.month == 10) &
-        (mta_data['Date'].dt.day < 11)
-    ]
-    # Aggregate data by service
-    pre_pandemic_totals = pre_pandemic_data[services].sum()
-    post_pandemic_totals = post_pandemic_data[services].sum()
-
-    # Combine totals into a DataFrame
-    totals_df = pd.DataFrame({
-        'Service': services,
-        'Post-Pandemic': post_pandemic_totals,
-        'Pre-Pandemic': pre_pandemic_totals
-    })
+    # Find the pre-pandemic and post-pandemic date ranges, the dates are parsed and sorted so each range is one slice
+    pandemic_start_row, post_pandemic_start_row, post_pandemic_end_row = np.searchsorted(
+        mta_data['Date'].to_numpy(),
+        [pandemic_start, current_period_start, current_period_end]  # 1-10 October 2024
+    )
 
-    # Store the first service before sorting for the legend (always Subways)
-    first_service = totals_df.sort_values(by='Pre-Pandemic', ascending=False).iloc[0]['Service']
+    # Aggregate data by service over one block of the selected service columns
+    ridership_values = mta_data[services].to_numpy()
+    pre_pandemic_totals = ridership_values[:pandemic_start_row].sum(axis=0)
+    post_pandemic_totals = ridership_values[post_pandemic_start_row:post_pandemic_end_row].sum(axis=0)
 
-    # Sort totals_df in ascending order for proper bar chart display
-    totals_df = totals_df.sort_values(by='Pre-Pandemic', ascending=True)
+    # Sort once in ascending order of pre-pandemic ridership for proper bar chart display
+    sort_order = np.argsort(pre_pandemic_totals)
+    sorted_services = [services[i] for i in sort_order]
+    sorted_pre_pandemic = pre_pandemic_totals[sort_order]
+    sorted_post_pandemic = post_pandemic_totals[sort_order]
 
-    # Extract sorted services and values
-    sorted_services = totals_df['Service']
-    sorted_pre_pandemic = totals_df['Pre-Pandemic']
-    sorted_post_pandemic = totals_df['Post-Pandemic']
+    # The service with the most pre-pandemic ridership is used for the legend (always Subways)
+    first_service = sorted_services[-1]
 
     # Use colours for the legend based on the first service (Subways)
     pre_legend_color = service_colours[first_service]['tinted_colour']
@@ -1717,14 +1668,11 @@ def create_daily_variability_boxplot(mta_data: pd.DataFrame, services: list, sta
     Returns:
         fig: Plotly Figure object with the box plot.
     '''
-    # Convert dates to datetime for filtering
-    mta_data['Date'] = pd.to_datetime(mta_data['Date'], format='%m/%d/%Y')
-
-    # Filter the data for the user-selected time range
-    filtered_data = mta_data[
-        (mta_data['Date'] >= pd.to_datetime(start_date)) &
-        (mta_data['Date'] <= pd.to_datetime(end_date))
-    ]
+    # Filter the data for the user-selected time range, the dates are parsed and sorted so the range is one slice
+    dates = mta_data['Date'].to_numpy()
+    start = np.searchsorted(dates, pd.to_datetime(start_date).to_datetime64(), side='left')
+    end = np.searchsorted(dates, pd.to_datetime(end_date).to_datetime64(), side='right')
+    filtered_data = mta_data.iloc[start:end]
 
     # Create a figure
     fig = go.Figure()